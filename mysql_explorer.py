@@ -1,17 +1,92 @@
 import pymysql
+from dbutils.pooled_db import PooledDB
 import os
+import functools
+import re
 import json
 import csv
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 from mcp.server import FastMCP
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Initialize FastMCP server
 mcp = FastMCP("MySQL Explorer",
     log_level="CRITICAL")
 
+# Allowed read-only statement prefixes, as a tuple so str.startswith checks them in one call
+ALLOWED_PREFIXES = (
+    'select',
+    'show',
+    'describe',
+    'desc', 
+    'explain',
+    'with'  # Common Table Expressions that start with WITH
+)
+
+# Keywords blocked even in otherwise read-only queries
+DANGEROUS_KEYWORDS = frozenset({
+    'insert', 'update', 'delete', 'drop', 'create', 'alter', 
+    'truncate', 'replace', 'merge', 'call', 'exec', 'execute',
+    'grant', 'revoke', 'set', 'reset', 'flush', 'kill',
+    'load', 'import', 'outfile', 'dumpfile', 'into outfile',
+    'into dumpfile', 'load_file'
+})
+
+# Single-, double- and backtick-quoted literals (honouring backslash escapes)
+_STRIP_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", re.DOTALL)
+
+# All dangerous keywords compiled into one alternation matched as whole words.
+# Longer keywords go first so e.g. 'into outfile' wins over 'outfile'.
+_DANGEROUS_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(kw) for kw in sorted(DANGEROUS_KEYWORDS, key=len, reverse=True)) + r')\b'
+)
+
+# Characters dropped when building file names for saved query results
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w .-]')
+_UNSAFE_QUERY_CHARS = re.compile(r'[^\w -]')
+
+# Table names accepted by the metadata tools; they are interpolated into a
+# backticked identifier so anything outside this set is rejected up front
+_TABLE_NAME_RE = re.compile(r'[\w$]+')
+
+def validate_table_name(table_name: str) -> None:
+    """Raise ValueError unless table_name is a plain identifier."""
+    if not _TABLE_NAME_RE.fullmatch(table_name):
+        raise ValueError(f"Invalid table name '{table_name}'")
+
+def sanitize_and_classify(query: str) -> tuple[str, bool]:
+    """Normalize a query for validation in a single pass over its literals.
+    
+    Quoted literals are removed, then the remainder is lowercased and its
+    whitespace collapsed.
+    
+    Returns:
+        Tuple of (cleaned_lower, has_multi_stmt) where has_multi_stmt is True
+        when a semicolon appears outside of quotes
+    """
+    cleaned = _STRIP_STRINGS.sub(' ', query)
+    has_multi_stmt = ';' in cleaned
+    return ' '.join(cleaned.lower().split()), has_multi_stmt
+
+def contains_dangerous_keywords(sql: str) -> tuple[bool, str]:
+    """Check a query cleaned by sanitize_and_classify for dangerous keywords.
+    
+    Returns:
+        Tuple of (found, keyword) where keyword is the first offending word
+    """
+    match = _DANGEROUS_RE.search(sql)
+    if match:
+        return True, match.group(1)
+    return False, ""
+
+@functools.lru_cache(maxsize=1)
 def get_db_config():
-    """Get database configuration from environment variables."""
+    """Get database configuration from environment variables (read once and cached)."""
     config = {
         "host": os.getenv("MYSQL_HOST", "127.0.0.1"),
         "port": int(os.getenv("MYSQL_PORT", "3306")),
@@ -26,18 +101,52 @@ def get_db_config():
     
     return config
 
+_pool = None
+
+def get_pool() -> PooledDB:
+    """Get the shared connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = PooledDB(
+            creator=pymysql,
+            mincached=2,
+            maxcached=8,
+            maxconnections=16,
+            blocking=True,
+            **get_db_config()
+        )
+    return _pool
+
 class MySQLConnection:
-    def __init__(self, config: Dict[str, Any]):
-        self.config = config
+    def __init__(self, streaming: bool = False):
+        self.streaming = streaming
         self.conn = None
+        self.cursor = None
         
     def __enter__(self):
-        self.conn = pymysql.connect(**self.config)
+        # Borrow a pooled connection instead of doing a fresh handshake
+        self.conn = get_pool().connection()
+        if self.streaming:
+            # Server-side cursor: rows are read from the wire on demand
+            # instead of buffering the whole result set client-side
+            self.cursor = self.conn.cursor(pymysql.cursors.SSDictCursor)
+            return self.cursor
         return self.conn
         
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            self.conn.close()
+        try:
+            if self.cursor:
+                # Drain any unread rows so the connection stays in sync
+                try:
+                    self.cursor.close()
+                except pymysql.Error:
+                    # The connection dropped while draining; rows already read are
+                    # still valid, so don't replace the result or the original error
+                    pass
+        finally:
+            if self.conn:
+                # Returns the connection to the pool
+                self.conn.close()
 
 @mcp.tool()
 def read_query(
@@ -57,8 +166,6 @@ def read_query(
     Returns:
         Dictionary containing query results and metadata
     """
-    config = get_db_config()
-    
     # Clean and validate the query
     query = query.strip()
     
@@ -66,87 +173,23 @@ def read_query(
     if query.endswith(';'):
         query = query[:-1].strip()
     
-    # Check for multiple statements by looking for semicolons not inside quotes
-    def contains_multiple_statements(sql: str) -> bool:
-        in_single_quote = False
-        in_double_quote = False
-        escaped = False
-        for char in sql:
-            if escaped:
-                escaped = False
-                continue
-            if char == '\\':
-                escaped = True
-                continue
-            if char == "'" and not in_double_quote:
-                in_single_quote = not in_single_quote
-            elif char == '"' and not in_single_quote:
-                in_double_quote = not in_double_quote
-            elif char == ';' and not in_single_quote and not in_double_quote:
-                return True
-        return False
-    
-    if contains_multiple_statements(query):
+    # Strip literals, normalize, and look for semicolons outside quotes in one pass
+    query_normalized, has_multi_stmt = sanitize_and_classify(query)
+    if has_multi_stmt:
         raise ValueError("Multiple SQL statements are not allowed")
     
-    # Normalize query for validation
-    query_normalized = ' '.join(query.lower().split())
-    
-    # List of allowed read-only statement prefixes
-    allowed_prefixes = [
-        'select',
-        'show',
-        'describe',
-        'desc', 
-        'explain',
-        'with'  # Common Table Expressions that start with WITH
-    ]
-    
     # Check if query starts with allowed prefix
-    if not any(query_normalized.startswith(prefix) for prefix in allowed_prefixes):
+    if not query_normalized.startswith(ALLOWED_PREFIXES):
         raise ValueError("Only SELECT, WITH, SHOW, DESCRIBE, and EXPLAIN queries are allowed")
     
     # Additional safety checks - block dangerous keywords even in allowed queries
-    dangerous_keywords = [
-        'insert', 'update', 'delete', 'drop', 'create', 'alter', 
-        'truncate', 'replace', 'merge', 'call', 'exec', 'execute',
-        'grant', 'revoke', 'set', 'reset', 'flush', 'kill',
-        'load', 'import', 'outfile', 'dumpfile', 'into outfile',
-        'into dumpfile', 'load_file'
-    ]
-    
-    # Check for dangerous keywords (but allow them in string literals)
-    def contains_dangerous_keywords(sql: str) -> tuple[bool, str]:
-        # Remove string literals to avoid false positives
-        cleaned_sql = sql
-        
-        # Remove single-quoted strings
-        import re
-        cleaned_sql = re.sub(r"'[^']*'", "''", cleaned_sql)
-        # Remove double-quoted strings  
-        cleaned_sql = re.sub(r'"[^"]*"', '""', cleaned_sql)
-        # Remove backtick-quoted identifiers
-        cleaned_sql = re.sub(r'`[^`]*`', '``', cleaned_sql)
-        
-        # Normalize whitespace
-        cleaned_sql = ' '.join(cleaned_sql.lower().split())
-        
-        for keyword in dangerous_keywords:
-            # Check for keyword as whole word (with word boundaries)
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-            if re.search(pattern, cleaned_sql):
-                return True, keyword
-        return False, ""
-    
     has_dangerous, dangerous_word = contains_dangerous_keywords(query_normalized)
     if has_dangerous:
         raise ValueError(f"Query contains potentially dangerous keyword '{dangerous_word}'. Only read-only operations are allowed.")
     
     params = params or []
     
-    with MySQLConnection(config) as conn:
-        cursor = conn.cursor()
-        
+    with MySQLConnection(streaming=True) as cursor:
         try:
             # Only add LIMIT if query doesn't already have one and it's a SELECT query
             if 'limit' not in query_normalized and query_normalized.startswith('select'):
@@ -154,13 +197,13 @@ def read_query(
             
             cursor.execute(query, params)
             
+            # Rows already come back as dictionaries from the DictCursor
             if fetch_all:
-                results = cursor.fetchall()
+                # Stream rows from the server and stop once row_limit is reached
+                result_data = cursor.fetchmany(row_limit)
             else:
-                results = [cursor.fetchone()]
-                
-            # Convert results to list of dictionaries
-            result_data = [dict(row) for row in results if row is not None]
+                row = cursor.fetchone()
+                result_data = [row] if row is not None else []
             
             # Return query results with metadata
             return {
@@ -178,12 +221,15 @@ def read_query(
         except pymysql.Error as e:
             raise ValueError(f"MySQL error: {str(e)}")
 
-def save_query_results(query: str, data: List[Dict[str, Any]], file_format: str, params: Optional[List[Any]] = None, custom_filename: Optional[str] = None) -> Dict[str, Any]:
+def save_query_results(query: str, data: Iterable[Dict[str, Any]], file_format: str, params: Optional[List[Any]] = None, custom_filename: Optional[str] = None) -> Dict[str, Any]:
     """Save query results to temp_data folder with custom or auto-generated filename.
     
+    Rows are written as they are consumed, so data may be a generator over a
+    streaming cursor and is never held in memory as a whole.
+    
     Args:
         query: The SQL query that was executed
-        data: The query results to save
+        data: The query results to save (any iterable of row dictionaries)
         file_format: Format to save in ('json' or 'csv')
         params: Query parameters used
         custom_filename: Custom filename (without extension). If None, auto-generates.
@@ -194,9 +240,13 @@ def save_query_results(query: str, data: List[Dict[str, Any]], file_format: str,
     # Ensure temp_data directory exists
     os.makedirs("temp_data", exist_ok=True)
     
+    # Single clock read shared by the file name and both metadata blocks
+    now = datetime.now()
+    now_iso = now.isoformat()
+    
     if custom_filename:
         # Use custom filename, sanitize it for safety
-        safe_filename = "".join(c for c in custom_filename if c.isalnum() or c in (' ', '_', '-', '.')).strip()
+        safe_filename = _UNSAFE_FILENAME_CHARS.sub('', custom_filename).strip()
         safe_filename = safe_filename.replace(' ', '_')
         # Remove any existing extension
         if '.' in safe_filename:
@@ -204,53 +254,64 @@ def save_query_results(query: str, data: List[Dict[str, Any]], file_format: str,
         filename = f"{safe_filename}.{file_format}"
     else:
         # Auto-generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         
         # Create a safe filename from query (first 50 chars, replace unsafe chars)
         query_snippet = query.replace('\n', ' ').replace('\r', '')[:50]
-        safe_query = "".join(c for c in query_snippet if c.isalnum() or c in (' ', '_', '-')).strip()
+        safe_query = _UNSAFE_QUERY_CHARS.sub('', query_snippet).strip()
         safe_query = safe_query.replace(' ', '_')
         
         filename = f"query_{timestamp}_{safe_query}.{file_format}"
     
     filepath = os.path.join("temp_data", filename)
     
+    row_count = 0
+    
     try:
         if file_format.lower() == 'json':
-            # Save as JSON with metadata
-            output_data = {
-                "metadata": {
-                    "timestamp": datetime.now().isoformat(),
+            # Save as JSON, writing one row at a time. Metadata goes after the
+            # data since row_count is only known once every row has been written.
+            with open(filepath, 'wb') as f:
+                f.write(b'{\n  "data": [')
+                for row in data:
+                    f.write(b',\n    ' if row_count else b'\n    ')
+                    f.write(dump_json(row, indent=False))
+                    row_count += 1
+                f.write(b'\n  ],\n  "metadata": ')
+                f.write(dump_json({
+                    "timestamp": now_iso,
                     "query": query,
                     "params": params,
-                    "row_count": len(data),
+                    "row_count": row_count,
                     "filename": filename
-                },
-                "data": data
-            }
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False, default=str)
+                }, indent=False))
+                f.write(b'\n}\n')
                 
         elif file_format.lower() == 'csv':
-            # Save as CSV
-            if data:
+            # Save as CSV; the first row supplies the header
+            rows = iter(data)
+            first_row = next(rows, None)
+            if first_row is not None:
                 with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=data[0].keys())
+                    writer = csv.DictWriter(f, fieldnames=first_row.keys())
                     writer.writeheader()
-                    writer.writerows(data)
+                    writer.writerow(first_row)
+                    row_count = 1
+                    for row in rows:
+                        writer.writerow(row)
+                        row_count += 1
                     
                 # Also save metadata as separate JSON file
                 metadata_filepath = filepath.replace('.csv', '_metadata.json')
                 metadata = {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now_iso,
                     "query": query,
                     "params": params,
-                    "row_count": len(data),
+                    "row_count": row_count,
                     "csv_file": filename
                 }
-                with open(metadata_filepath, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
+                with open(metadata_filepath, 'wb') as f:
+                    f.write(dump_json(metadata))
         else:
             raise ValueError(f"Unsupported file format: {file_format}. Use 'json' or 'csv'.")
         
@@ -264,16 +325,33 @@ def save_query_results(query: str, data: List[Dict[str, Any]], file_format: str,
             "filename": filename,
             "format": file_format,
             "size": format_file_size(file_size),
-            "row_count": len(data)
+            "row_count": row_count
         }
         
     except Exception as e:
         print(f"WARNING: Failed to save query results to file: {str(e)}")
         return {
             "error": f"Failed to save file: {str(e)}",
-            "row_count": len(data)
+            "row_count": row_count
         }
 
+def dump_json(obj: Any, indent: bool = True) -> bytes:
+    """Serialize an object to UTF-8 JSON bytes.
+    
+    Uses orjson when it is installed and falls back to the stdlib json module.
+    Values JSON cannot represent natively (e.g. Decimal, datetime) are written
+    with str() on both paths, so datetimes keep the "2024-01-02 03:04:05"
+    format rather than orjson's ISO 8601 form. Float formatting may differ
+    between the two (e.g. orjson writes 1e16 where json writes 1e+16).
+    """
+    if orjson is not None:
+        option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                  | (orjson.OPT_INDENT_2 if indent else 0))
+        return orjson.dumps(obj, option=option, default=str)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format."""
     if size_bytes < 1024:
@@ -292,24 +370,19 @@ def list_tables() -> List[str]:
     Returns:
         List of table names in the database
     """
-    config = get_db_config()
-    
-    with MySQLConnection(config) as conn:
-        cursor = conn.cursor()
+    with MySQLConnection() as conn:
+        # Plain tuple cursor: each row is just (table_name,)
+        cursor = conn.cursor(pymysql.cursors.Cursor)
         
         try:
-            cursor.execute("SHOW TABLES")
+            # Let MySQL do the sorting rather than sorting in Python
+            cursor.execute(
+                "SELECT TABLE_NAME FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() ORDER BY TABLE_NAME"
+            )
             results = cursor.fetchall()
             
-            # Extract table names from the results
-            # The result format is [{'Tables_in_database_name': 'table_name'}, ...]
-            table_names = []
-            for row in results:
-                # Get the first (and only) value from each row dictionary
-                table_name = list(row.values())[0]
-                table_names.append(table_name)
-            
-            return sorted(table_names)
+            return [row[0] for row in results]
             
         except pymysql.Error as e:
             raise ValueError(f"MySQL error: {str(e)}")
@@ -330,22 +403,58 @@ def describe_table(table_name: str) -> List[Dict[str, Any]]:
         - Default: Default value for the column
         - Extra: Extra information (auto_increment, etc.)
     """
-    config = get_db_config()
+    validate_table_name(table_name)
     
-    with MySQLConnection(config) as conn:
+    with MySQLConnection() as conn:
         cursor = conn.cursor()
         
         try:
-            # Verify table exists
-            cursor.execute("SHOW TABLES LIKE %s", [table_name])
-            if not cursor.fetchone():
-                raise ValueError(f"Table '{table_name}' does not exist")
-            
             # Get table schema
             cursor.execute(f"DESCRIBE `{table_name}`")
             columns = cursor.fetchall()
             
-            return [dict(row) for row in columns]
+            return list(columns)
+            
+        except pymysql.err.ProgrammingError as e:
+            raise ValueError(f"Table '{table_name}' does not exist or cannot be described: {str(e)}")
+        except pymysql.Error as e:
+            raise ValueError(f"MySQL error: {str(e)}")
+
+@mcp.tool()
+def describe_tables(table_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Get the schema of several tables with a single query.
+    
+    Args:
+        table_names: Names of the tables to describe
+        
+    Returns:
+        Dictionary mapping each existing table name to its columns, in
+        ordinal order, using the same keys as describe_table (Field, Type,
+        Null, Key, Default, Extra). Tables that do not exist are omitted.
+    """
+    if not table_names:
+        return {}
+    
+    placeholders = ", ".join(["%s"] * len(table_names))
+    
+    with MySQLConnection() as conn:
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        
+        try:
+            # One information_schema query instead of a DESCRIBE per table
+            cursor.execute(f"""
+                SELECT TABLE_NAME, COLUMN_NAME AS Field, COLUMN_TYPE AS Type,
+                       IS_NULLABLE AS `Null`, COLUMN_KEY AS `Key`,
+                       COLUMN_DEFAULT AS `Default`, EXTRA AS Extra
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """, table_names)
+            
+            tables = {}
+            for row in cursor.fetchall():
+                tables.setdefault(row.pop('TABLE_NAME'), []).append(row)
+            return tables
             
         except pymysql.Error as e:
             raise ValueError(f"MySQL error: {str(e)}")
@@ -360,23 +469,20 @@ def show_table_indexes(table_name: str) -> List[Dict[str, Any]]:
     Returns:
         List of dictionaries containing index information
     """
-    config = get_db_config()
+    validate_table_name(table_name)
     
-    with MySQLConnection(config) as conn:
+    with MySQLConnection() as conn:
         cursor = conn.cursor()
         
         try:
-            # Verify table exists
-            cursor.execute("SHOW TABLES LIKE %s", [table_name])
-            if not cursor.fetchone():
-                raise ValueError(f"Table '{table_name}' does not exist")
-            
             # Get table indexes
             cursor.execute(f"SHOW INDEX FROM `{table_name}`")
             indexes = cursor.fetchall()
             
-            return [dict(row) for row in indexes]
+            return list(indexes)
             
+        except pymysql.err.ProgrammingError as e:
+            raise ValueError(f"Table '{table_name}' does not exist or cannot be inspected: {str(e)}")
         except pymysql.Error as e:
             raise ValueError(f"MySQL error: {str(e)}")
 
@@ -390,27 +496,24 @@ def show_create_table(table_name: str) -> str:
     Returns:
         The CREATE TABLE statement as a string
     """
-    config = get_db_config()
+    validate_table_name(table_name)
     
-    with MySQLConnection(config) as conn:
-        cursor = conn.cursor()
+    with MySQLConnection() as conn:
+        cursor = conn.cursor(pymysql.cursors.Cursor)
         
         try:
-            # Verify table exists
-            cursor.execute("SHOW TABLES LIKE %s", [table_name])
-            if not cursor.fetchone():
-                raise ValueError(f"Table '{table_name}' does not exist")
-            
             # Get CREATE TABLE statement
             cursor.execute(f"SHOW CREATE TABLE `{table_name}`")
             result = cursor.fetchone()
             
             if result:
-                # The result contains table name and create statement
-                return list(result.values())[1]  # Get the CREATE TABLE statement
+                # The result row is (table name, create statement)
+                return result[1]
             else:
                 raise ValueError(f"Could not retrieve CREATE TABLE statement for '{table_name}'")
             
+        except pymysql.err.ProgrammingError as e:
+            raise ValueError(f"Table '{table_name}' does not exist or cannot be inspected: {str(e)}")
         except pymysql.Error as e:
             raise ValueError(f"MySQL error: {str(e)}")
 
@@ -421,32 +524,19 @@ def get_database_info() -> Dict[str, Any]:
     Returns:
         Dictionary containing database information
     """
-    config = get_db_config()
-    
-    with MySQLConnection(config) as conn:
+    with MySQLConnection() as conn:
         cursor = conn.cursor()
         
         try:
-            info = {}
-            
-            # Get database name
-            cursor.execute("SELECT DATABASE()")
-            result = cursor.fetchone()
-            info['database_name'] = list(result.values())[0] if result else None
-            
-            # Get MySQL version
-            cursor.execute("SELECT VERSION()")
-            result = cursor.fetchone()
-            info['mysql_version'] = list(result.values())[0] if result else None
-            
-            # Get current user
-            cursor.execute("SELECT USER()")
-            result = cursor.fetchone()
-            info['current_user'] = list(result.values())[0] if result else None
-            
-            # Get table count
-            cursor.execute("SHOW TABLES")
-            info['table_count'] = len(cursor.fetchall())
+            # Fetch name, version, user and table count in a single round trip
+            cursor.execute("""
+                SELECT DATABASE() AS database_name,
+                       VERSION() AS mysql_version,
+                       USER() AS `current_user`,
+                       (SELECT COUNT(*) FROM information_schema.tables
+                        WHERE table_schema = DATABASE()) AS table_count
+            """)
+            info = cursor.fetchone()
             
             return info
             
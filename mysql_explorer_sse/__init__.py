@@ -4,7 +4,13 @@ MySQL Explorer SSE Package
 MySQL 数据库探索器 - Server-Sent Events 版本
 """
 
-from .mysql_explorer_sse import main
-
 __version__ = "0.1.0"
-__all__ = ["main"] 
\ No newline at end of file
+__all__ = ["main"]
+
+
+def __getattr__(name):
+    # 延迟导入：只有用到 main 时才加载 FastMCP 和数据库相关模块
+    if name == "main":
+        from .mysql_explorer_sse import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+MySQL Explorer SSE 服务器使用的 ASGI 中间件
+"""
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class SSEHeadersMiddleware:
+    """为 text/event-stream 响应补齐反向代理相关的响应头
+
+    - Cache-Control: 未设置时补为 no-cache，避免事件流被缓存
+    - X-Accel-Buffering: no，禁止 nginx 缓冲事件流
+    - Connection: keep-alive，仅用于 HTTP/1.x；HTTP/2 禁止该响应头，会被移除
+    
+    FastMCP 的 SSE 端点在连接结束后还会再返回一个空 Response，uvicorn 会忽略它，
+    hypercorn 则会报错，因此同一请求中重复的响应消息会被丢弃。
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        is_http1 = scope.get("http_version", "1.1").startswith("1")
+        started = False
+        duplicate = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started, duplicate
+            if message["type"] == "http.response.start":
+                if started:
+                    duplicate = True
+                    return
+                started = True
+                headers = MutableHeaders(scope=message)
+                if headers.get("content-type", "").startswith("text/event-stream"):
+                    headers.setdefault("cache-control", "no-cache")
+                    headers["x-accel-buffering"] = "no"
+                    if is_http1:
+                        headers["connection"] = "keep-alive"
+                    else:
+                        del headers["connection"]
+            elif duplicate:
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -6,28 +6,86 @@ MySQL 数据库探索工具 - SSE (Server-Sent Events) 版本
 支持执行 SQL 查询、浏览表结构、导出数据等操作。
 """
 
+import io
 import os
+import functools
+import re
 import socket
+import threading
 import pymysql
 import json
 import csv
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+import anyio.to_thread
 from fastmcp import FastMCP
+from dbutils.pooled_db import PooledDB
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 
-# 获取服务器配置
-SSE_HOST = os.getenv("SSE_HOST", "localhost")
-SSE_PORT = int(os.getenv("SSE_PORT", "3001"))
+# 初始化 FastMCP 服务器；监听地址由 run_sse_server 根据 SSE_HOST/SSE_PORT 设置
+mcp = FastMCP("MySQL Explorer SSE")
 
-# 初始化 FastMCP 服务器，指定端口和主机
-mcp = FastMCP("MySQL Explorer SSE", host=SSE_HOST, port=SSE_PORT)
+# 单引号、双引号和反引号包裹的字面量（支持反斜杠转义）
+_STRIP_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", re.DOTALL)
 
+def sanitize_and_classify(query: str) -> tuple[str, bool]:
+    """一次性去除字面量并规范化查询语句，供校验使用
+    
+    返回:
+        tuple: (cleaned_lower, has_multi_stmt)
+        - cleaned_lower: 去除引号内容、转小写并合并空白后的语句
+        - has_multi_stmt: 引号之外是否出现分号
+    """
+    cleaned = _STRIP_STRINGS.sub(' ', query)
+    has_multi_stmt = ';' in cleaned
+    return ' '.join(cleaned.lower().split()), has_multi_stmt
+
+# 允许执行的只读语句前缀，使用元组以便 str.startswith 一次完成匹配
+ALLOWED_PREFIXES = ('select', 'show', 'describe', 'desc', 'explain', 'with')
+
+# 危险关键词，非只读语句命中时在错误信息中提示
+DANGEROUS_KEYWORDS = frozenset({
+    'DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 
+    'TRUNCATE', 'REPLACE', 'GRANT', 'REVOKE', 'SET', 'CALL',
+    'EXECUTE', 'PREPARE', 'DEALLOCATE', 'LOCK', 'UNLOCK',
+    'START TRANSACTION', 'COMMIT', 'ROLLBACK', 'SAVEPOINT'
+})
+
+# 所有危险关键词编译为一个按整词匹配的正则，模块加载时只编译一次
+_DANGEROUS_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(kw) for kw in sorted(DANGEROUS_KEYWORDS, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+
+def contains_dangerous_keywords(sql: str) -> tuple[bool, str]:
+    """检查经 sanitize_and_classify 处理后的语句是否包含危险关键词
+    
+    返回:
+        tuple: (是否命中, 命中的关键词)
+    """
+    match = _DANGEROUS_RE.search(sql)
+    if match:
+        return True, match.group(1).upper()
+    return False, ""
+
+# 元数据工具接受的表名；表名会被拼接进反引号标识符，因此其余字符一律拒绝
+_TABLE_NAME_RE = re.compile(r'[\w$]+')
+
+def validate_table_name(table_name: str) -> None:
+    """校验表名是否为合法标识符
+    
+    异常:
+        ValueError: 表名包含非法字符时抛出
+    """
+    if not _TABLE_NAME_RE.fullmatch(table_name):
+        raise ValueError(f"非法的表名 '{table_name}'")
+
+@functools.lru_cache(maxsize=1)
 def get_db_config():
-    """从环境变量获取数据库配置信息
+    """从环境变量获取数据库配置信息（仅在首次调用时读取，之后使用缓存）
     
     返回:
         dict: 包含数据库连接所需的配置信息
@@ -55,20 +113,74 @@ def get_db_config():
     
     return config
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> PooledDB:
+    """获取共享的数据库连接池，首次调用时创建"""
+    global _pool
+    if _pool is None:
+        # 工具在线程池中并发执行，加锁避免重复创建连接池
+        with _pool_lock:
+            if _pool is None:
+                _pool = PooledDB(
+                    creator=pymysql,
+                    mincached=2,
+                    maxcached=8,
+                    maxconnections=16,
+                    blocking=True,
+                    **get_db_config()
+                )
+    return _pool
+
+def blocking_tool(func):
+    """将阻塞的函数注册为 MCP 工具，调用时在 anyio 线程池中执行
+    
+    FastMCP 会在事件循环中直接调用同步工具，数据库查询期间所有 SSE 连接都会被阻塞；
+    注册异步包装函数后，查询在线程池中执行，并发数由线程池大小（SSE_THREADPOOL）限制。
+    
+    参数:
+        func: 同步工具函数
+        
+    返回:
+        原函数，模块内部仍可直接同步调用
+    """
+    @functools.wraps(func)
+    async def run_in_thread(*args, **kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs))
+    mcp.tool()(run_in_thread)
+    return func
+
 class MySQLConnection:
-    def __init__(self, config: Dict[str, Any]):
-        self.config = config
+    def __init__(self, streaming: bool = False):
+        self.streaming = streaming
         self.conn = None
+        self.cursor = None
         
     def __enter__(self):
-        self.conn = pymysql.connect(**self.config)
+        # 从连接池借用连接，避免每次请求都重新握手
+        self.conn = get_pool().connection()
+        if self.streaming:
+            # 服务端游标：按需从网络读取行，避免在客户端缓冲整个结果集
+            self.cursor = self.conn.cursor(pymysql.cursors.SSDictCursor)
+            return self.cursor
         return self.conn
         
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            self.conn.close()
+        try:
+            if self.cursor:
+                # 读完剩余未读取的行，避免连接出现 "Commands out of sync"
+                try:
+                    self.cursor.close()
+                except pymysql.Error:
+                    # 读取剩余行时连接断开：已读取的结果仍然有效，不用该错误覆盖结果或原有异常
+                    pass
+        finally:
+            if self.conn:
+                # 归还连接到连接池
+                self.conn.close()
 
-@mcp.tool()
+@blocking_tool
 def read_query(
     query: str,
     params: Optional[List[Any]] = None,
@@ -90,8 +202,6 @@ def read_query(
         - columns: List of column names
         - query_info: Information about the executed query
     """
-    config = get_db_config()
-    
     # 清理和验证查询
     query = query.strip()
     
@@ -99,48 +209,15 @@ def read_query(
     if query.endswith(';'):
         query = query[:-1].strip()
     
-    # 检查多语句查询
-    def contains_multiple_statements(sql: str) -> bool:
-        in_single_quote = False
-        in_double_quote = False
-        for char in sql:
-            if char == "'" and not in_double_quote:
-                in_single_quote = not in_single_quote
-            elif char == '"' and not in_single_quote:
-                in_double_quote = not in_double_quote
-            elif char == ';' and not in_single_quote and not in_double_quote:
-                return True
-        return False
-    
-    if contains_multiple_statements(query):
+    # 一次遍历完成字面量剥离、规范化和多语句检查
+    query_lower, has_multi_stmt = sanitize_and_classify(query)
+    if has_multi_stmt:
         raise ValueError("不允许多语句查询，请一次只执行一条语句")
     
-    # 检查危险关键词
-    def contains_dangerous_keywords(sql: str) -> tuple[bool, str]:
-        # 移除字符串字面量以避免误报
-        sql_no_strings = sql
-        import re
-        sql_no_strings = re.sub(r"'[^']*'", "", sql_no_strings)
-        sql_no_strings = re.sub(r'"[^"]*"', "", sql_no_strings)
-        
-        dangerous_keywords = [
-            'DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 
-            'TRUNCATE', 'REPLACE', 'GRANT', 'REVOKE', 'SET', 'CALL',
-            'EXECUTE', 'PREPARE', 'DEALLOCATE', 'LOCK', 'UNLOCK',
-            'START TRANSACTION', 'COMMIT', 'ROLLBACK', 'SAVEPOINT'
-        ]
-        
-        sql_upper = sql_no_strings.upper()
-        for keyword in dangerous_keywords:
-            if keyword in sql_upper:
-                return True, keyword
-        return False, ""
-    
     # 验证查询类型
-    query_lower = query.lower().strip()
-    if not any(query_lower.startswith(prefix) for prefix in ('select', 'show', 'describe', 'desc', 'explain', 'with')):
+    if not query_lower.startswith(ALLOWED_PREFIXES):
         # 检查是否包含危险关键词
-        is_dangerous, dangerous_keyword = contains_dangerous_keywords(query)
+        is_dangerous, dangerous_keyword = contains_dangerous_keywords(query_lower)
         if is_dangerous:
             raise ValueError(f"检测到可能的危险操作: {dangerous_keyword}。为了安全，只允许执行 SELECT, SHOW, DESCRIBE, EXPLAIN 和 WITH 查询。")
         else:
@@ -148,9 +225,7 @@ def read_query(
     
     params = params or []
     
-    with MySQLConnection(config) as conn:
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        
+    with MySQLConnection(streaming=True) as cursor:
         try:
             # 只对 SELECT 查询添加 LIMIT
             if query_lower.startswith('select') and 'limit' not in query_lower:
@@ -158,18 +233,17 @@ def read_query(
             
             cursor.execute(query, params)
             
+            # DictCursor 返回的行已经是字典，无需再复制
             if fetch_all:
-                results = cursor.fetchall()
+                # 流式读取，达到 row_limit 后即停止
+                data = cursor.fetchmany(row_limit)
             else:
                 result = cursor.fetchone()
-                results = [result] if result else []
+                data = [result] if result else []
             
             # 获取列名
             columns = [desc[0] for desc in cursor.description] if cursor.description else []
             
-            # 转换结果为普通字典列表
-            data = [dict(row) for row in results]
-            
             return {
                 "data": data,
                 "row_count": len(data),
@@ -184,66 +258,88 @@ def read_query(
         except pymysql.Error as e:
             raise ValueError(f"MySQL 错误: {str(e)}")
 
-@mcp.tool()
-def execute_sql(query: str) -> List[str]:
+def format_csv_result(columns: List[str], rows: List[Any]) -> List[str]:
+    """将查询结果转换为 CSV 文本
+    
+    参数:
+        columns (list): 列名列表
+        rows (list): 行数据列表，每行为按列顺序排列的值序列
+        
+    返回:
+        list: 仅包含一段 CSV 文本的列表，NULL 值输出为 "NULL"
+    """
+    if not rows:
+        return ["查询未返回任何结果"]
+    
+    # 由 csv.writer 一次性写入缓冲区
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if columns:
+        writer.writerow(columns)
+    writer.writerows(["NULL" if value is None else value for value in row] for row in rows)
+    
+    return [buffer.getvalue().rstrip("\n")]
+
+def _run_read_sql(sql: str, params: Optional[List[Any]] = None) -> List[str]:
+    """直接在连接池连接上执行代码内置的只读 SQL，并以 CSV 文本返回结果
+    
+    语句由代码本身定义，因此跳过 read_query 的前缀和危险关键词校验。
+    """
+    try:
+        with MySQLConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            rows = cursor.fetchall()
+        return format_csv_result(columns, rows)
+        
+    except Exception as e:
+        return [f"执行查询时出错: {str(e)}"]
+
+@blocking_tool
+def execute_sql(query: str, params: Optional[List[Any]] = None) -> List[str]:
     """执行SQL查询语句（兼容性工具，建议使用 read_query）
     
     参数:
         query (str): 要执行的SQL语句
+        params (list, 可选): 查询参数，对应语句中的 %s 占位符
         
     返回:
         list: 包含查询结果的文本列表
     """
     try:
-        result = read_query(query)
-        
-        if not result["data"]:
-            return ["查询未返回任何结果"]
-        
-        # 转换为CSV格式
-        lines = []
-        if result["columns"]:
-            lines.append(",".join(result["columns"]))
-        
-        for row in result["data"]:
-            formatted_row = []
-            for col in result["columns"]:
-                value = row.get(col)
-                if value is None:
-                    formatted_row.append("NULL")
-                else:
-                    formatted_row.append(str(value))
-            lines.append(",".join(formatted_row))
-        
-        return ["\n".join(lines)]
+        result = read_query(query, params)
+        # 行字典的键顺序与列顺序一致，直接按值写出
+        return format_csv_result(result["columns"], [row.values() for row in result["data"]])
         
     except Exception as e:
         return [f"执行查询时出错: {str(e)}"]
 
-@mcp.tool()
+@blocking_tool
 def list_tables() -> List[str]:
     """List all tables in the MySQL database.
     
     Returns:
         List of table names in the database
     """
-    config = get_db_config()
-    
-    with MySQLConnection(config) as conn:
+    with MySQLConnection() as conn:
         cursor = conn.cursor()
         
         try:
-            cursor.execute("SHOW TABLES")
+            # 由 MySQL 完成排序，无需在 Python 中再排序
+            cursor.execute(
+                "SELECT TABLE_NAME FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() ORDER BY TABLE_NAME"
+            )
             results = cursor.fetchall()
             
             # 提取表名 - results 是元组列表，每个元组包含一个表名
-            table_names = [row[0] for row in results]
-            return sorted(table_names)
+            return [row[0] for row in results]
             
         except pymysql.Error as e:
             raise ValueError(f"MySQL 错误: {str(e)}")
 
-@mcp.tool()
+@blocking_tool
 def describe_table(table_name: str) -> List[Dict[str, Any]]:
     """Get detailed information about a table's schema.
     
@@ -253,27 +349,63 @@ def describe_table(table_name: str) -> List[Dict[str, Any]]:
     Returns:
         List of dictionaries containing column information
     """
-    config = get_db_config()
+    validate_table_name(table_name)
     
-    with MySQLConnection(config) as conn:
+    with MySQLConnection() as conn:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         try:
-            # 验证表是否存在
-            cursor.execute("SHOW TABLES LIKE %s", [table_name])
-            if not cursor.fetchone():
-                raise ValueError(f"表 '{table_name}' 不存在")
-            
-            # 获取表结构
+            # 获取表结构；表不存在时 MySQL 会直接报错，无需预先检查
             cursor.execute(f"DESCRIBE `{table_name}`")
             columns = cursor.fetchall()
             
-            return [dict(row) for row in columns]
+            return list(columns)
+            
+        except pymysql.err.ProgrammingError as e:
+            raise ValueError(f"表 '{table_name}' 不存在或无法查看结构: {str(e)}")
+        except pymysql.Error as e:
+            raise ValueError(f"MySQL 错误: {str(e)}")
+
+@blocking_tool
+def describe_tables(table_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Get the schema of several tables with a single query.
+    
+    Args:
+        table_names: Names of the tables to describe
+        
+    Returns:
+        Dictionary mapping each existing table name to its columns, using the
+        same keys as describe_table. Tables that do not exist are omitted.
+    """
+    if not table_names:
+        return {}
+    
+    placeholders = ", ".join(["%s"] * len(table_names))
+    
+    with MySQLConnection() as conn:
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        
+        try:
+            # 一次查询 information_schema，代替逐表执行 DESCRIBE
+            cursor.execute(f"""
+                SELECT TABLE_NAME, COLUMN_NAME AS Field, COLUMN_TYPE AS Type,
+                       IS_NULLABLE AS `Null`, COLUMN_KEY AS `Key`,
+                       COLUMN_DEFAULT AS `Default`, EXTRA AS Extra
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """, table_names)
+            
+            # 按表名分组
+            tables = {}
+            for row in cursor.fetchall():
+                tables.setdefault(row.pop('TABLE_NAME'), []).append(row)
+            return tables
             
         except pymysql.Error as e:
             raise ValueError(f"MySQL 错误: {str(e)}")
 
-@mcp.tool()
+@blocking_tool
 def get_table_name(text: str) -> List[str]:
     """根据表的中文注释搜索数据库中的表名
     
@@ -285,11 +417,11 @@ def get_table_name(text: str) -> List[str]:
     """
     config = get_db_config()
     sql = ("SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_COMMENT "
-           f"FROM information_schema.TABLES WHERE TABLE_SCHEMA = '{config['database']}' "
-           f"AND TABLE_COMMENT LIKE '%{text}%'")
-    return execute_sql(sql)
+           "FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s "
+           "AND TABLE_COMMENT LIKE %s")
+    return _run_read_sql(sql, [config['database'], f"%{text}%"])
 
-@mcp.tool()
+@blocking_tool
 def get_table_desc(text: str) -> List[str]:
     """获取指定表的字段结构信息
     
@@ -301,13 +433,13 @@ def get_table_desc(text: str) -> List[str]:
     """
     config = get_db_config()
     table_names = [name.strip() for name in text.split(",")]
-    table_condition = "','".join(table_names)
+    placeholders = ", ".join(["%s"] * len(table_names))
     sql = ("SELECT TABLE_NAME, COLUMN_NAME, COLUMN_COMMENT "
-           f"FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = '{config['database']}' "
-           f"AND TABLE_NAME IN ('{table_condition}') ORDER BY TABLE_NAME, ORDINAL_POSITION")
-    return execute_sql(sql)
+           "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s "
+           f"AND TABLE_NAME IN ({placeholders}) ORDER BY TABLE_NAME, ORDINAL_POSITION")
+    return _run_read_sql(sql, [config['database'], *table_names])
 
-@mcp.tool()
+@blocking_tool
 def get_lock_tables() -> List[str]:
     """获取当前MySQL服务器InnoDB的行级锁信息
     
@@ -349,83 +481,55 @@ def get_lock_tables() -> List[str]:
     INNER JOIN information_schema.PROCESSLIST p2 ON p2.ID = r.trx_mysql_thread_id
     ORDER BY 等待时间 DESC"""
     
-    return execute_sql(sql)
+    return _run_read_sql(sql)
 
-@mcp.tool()
+@blocking_tool
 def get_database_info() -> Dict[str, Any]:
     """Get general information about the MySQL database.
     
     Returns:
         Dictionary containing database information
     """
-    config = get_db_config()
-    
-    with MySQLConnection(config) as conn:
+    with MySQLConnection() as conn:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         try:
-            info = {}
-            
-            # 获取数据库名
-            cursor.execute("SELECT DATABASE()")
-            result = cursor.fetchone()
-            info['database_name'] = list(result.values())[0] if result else None
-            
-            # 获取MySQL版本
-            cursor.execute("SELECT VERSION()")
-            result = cursor.fetchone()
-            info['mysql_version'] = list(result.values())[0] if result else None
-            
-            # 获取当前用户
-            cursor.execute("SELECT USER()")
-            result = cursor.fetchone()
-            info['current_user'] = list(result.values())[0] if result else None
-            
-            # 获取表数量
-            cursor.execute("SHOW TABLES")
-            info['table_count'] = len(cursor.fetchall())
+            # 一次往返获取数据库名、版本、当前用户和表数量
+            cursor.execute("""
+                SELECT DATABASE() AS database_name,
+                       VERSION() AS mysql_version,
+                       USER() AS `current_user`,
+                       (SELECT COUNT(*) FROM information_schema.tables
+                        WHERE table_schema = DATABASE()) AS table_count
+            """)
+            info = cursor.fetchone()
             
             return info
             
         except pymysql.Error as e:
             raise ValueError(f"MySQL 错误: {str(e)}")
 
-def main():
-    """主入口点函数"""
-    print(f"🚀 启动 MySQL Explorer SSE 服务器...")
-    print(f"📍 服务器地址: http://{SSE_HOST}:{SSE_PORT}")
-    print(f"🔗 SSE 端点: http://{SSE_HOST}:{SSE_PORT}/sse")
-    print("⚡ 按 Ctrl+C 停止服务器")
-    print("-" * 50)
+def check_database() -> str:
+    """测试数据库连接
     
-    try:
-        # 检查数据库配置
-        config = get_db_config()
-        print(f"📋 数据库配置:")
-        print(f"   主机: {config['host']}:{config['port']}")
-        print(f"   数据库: {config['database']}")
-        print(f"   用户: {config['user']}")
-        print()
-        
-        # 测试数据库连接
-        with MySQLConnection(config) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            print("✅ 数据库连接测试成功")
-        
-        print("🔄 启动 FastMCP SSE 服务器...")
-        mcp.run(transport="sse")
+    返回:
+        str: 数据库连接信息（用户@主机:端口/数据库），用于启动日志
         
-    except KeyboardInterrupt:
-        print("\n✅ 服务器已停止")
-    except Exception as e:
-        print(f"❌ 启动服务器时发生错误: {e}")
-        print(f"💡 建议:")
-        print(f"   1. 检查数据库连接配置")
-        print(f"   2. 确保 MySQL 服务器正在运行")
-        print(f"   3. 检查端口 {SSE_PORT} 是否被占用")
-        import sys
-        sys.exit(1)
+    异常:
+        ValueError: 缺少必需的数据库配置时抛出
+        pymysql.Error: 无法连接数据库时抛出
+    """
+    config = get_db_config()
+    with MySQLConnection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+    return f"{config['user']}@{config['host']}:{config['port']}/{config['database']}"
+
+def main():
+    """主入口点函数，通过 run_sse_server 启动 SSE 服务器"""
+    from .run_sse_server import main as run_server
+    run_server()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
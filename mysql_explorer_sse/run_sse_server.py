@@ -6,33 +6,418 @@
 """
 
 import os
+import stat
+import functools
+import importlib.util
+import logging
 import sys
-from . import mysql_explorer_sse as mcp
+import signal
+import socket
+from dataclasses import dataclass
+import anyio
+import anyio.to_thread
+import uvicorn
+from dotenv import load_dotenv
+import sse_starlette.sse
+from sse_starlette import EventSourceResponse
+from sse_starlette.event import ensure_bytes
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp
+from .middleware import SSEHeadersMiddleware
+
+logger = logging.getLogger(__name__)
+
+# SSE_HOST 以此前缀开头时监听 Unix 域套接字，例如 unix:/run/mysql-explorer.sock
+UNIX_SOCKET_PREFIX = "unix:"
+
+@dataclass(frozen=True)
+class SseConfig:
+    """SSE 服务器配置，由环境变量解析而来"""
+    host: str
+    port: int
+    uds_path: str | None
+    backlog: int
+    limit_concurrency: int | None
+    threadpool_size: int | None
+    access_log: bool
+    heartbeat: int
+    http2: bool
+    certfile: str | None
+    keyfile: str | None
+    cpu_affinity: frozenset[int] | None
+    
+    @property
+    def banner(self) -> str:
+        """启动时输出的提示信息"""
+        if self.uds_path:
+            address = self.host
+            endpoint = f"{self.host} (路径 /sse)"
+        else:
+            scheme = "https" if self.http2 and self.certfile else "http"
+            address = f"{scheme}://{self.host}:{self.port}"
+            endpoint = f"{address}/sse"
+        return (
+            "启动 MySQL Explorer SSE 服务器...\n"
+            f"服务器地址: {address}\n"
+            f"SSE 端点: {endpoint}\n"
+            "按 Ctrl+C 停止服务器\n"
+            + "-" * 50
+        )
+
+def _env_int(name: str, default: int | None = None, min_value: int | None = None,
+             max_value: int | None = None) -> int | None:
+    """读取整数类型的环境变量
+    
+    参数:
+        name (str): 环境变量名
+        default (int, 可选): 未设置或为空时的默认值
+        min_value (int, 可选): 允许的最小值
+        max_value (int, 可选): 允许的最大值
+        
+    返回:
+        int | None: 解析后的整数
+        
+    异常:
+        ValueError: 环境变量不是整数或超出取值范围时抛出
+    """
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须是整数，当前值: {value!r}")
+    if min_value is not None and number < min_value:
+        raise ValueError(f"{name} 不能小于 {min_value}，当前值: {number}")
+    if max_value is not None and number > max_value:
+        raise ValueError(f"{name} 不能大于 {max_value}，当前值: {number}")
+    return number
+
+@functools.lru_cache(maxsize=1)
+def get_sse_config() -> SseConfig:
+    """从环境变量读取 SSE 服务器配置，解析结果会被缓存
+    
+    返回:
+        SseConfig: 服务器配置
+        
+    异常:
+        ValueError: 环境变量取值无效时抛出
+    """
+    host = os.getenv("SSE_HOST", "localhost")
+    cpu_affinity = os.getenv("SSE_CPU_AFFINITY")
+    if cpu_affinity and not all(cpu.strip().isdigit() for cpu in cpu_affinity.split(",")):
+        raise ValueError(f"SSE_CPU_AFFINITY 必须是逗号分隔的 CPU 编号，当前值: {cpu_affinity!r}")
+    return SseConfig(
+        host=host,
+        # 默认使用 3001 端口
+        port=_env_int("SSE_PORT", 3001, min_value=1, max_value=65535),
+        uds_path=host[len(UNIX_SOCKET_PREFIX):] if host.startswith(UNIX_SOCKET_PREFIX) else None,
+        # 连接与并发调优参数
+        backlog=_env_int("SSE_BACKLOG", 2048, min_value=1),
+        limit_concurrency=_env_int("SSE_LIMIT_CONCURRENCY", min_value=1),
+        threadpool_size=_env_int("SSE_THREADPOOL", min_value=1),
+        access_log=os.getenv("SSE_ACCESS_LOG", "0") == "1",
+        # 间隔为 0 时 sse_starlette 会不停发送心跳，负数会导致每个 SSE 请求报错
+        heartbeat=_env_int("SSE_HEARTBEAT", 15, min_value=1),
+        # HTTP/2 选项，默认仍使用 uvicorn（仅支持 HTTP/1.1）
+        http2=os.getenv("SSE_HTTP2", "0") == "1",
+        certfile=os.getenv("SSE_CERTFILE"),
+        keyfile=os.getenv("SSE_KEYFILE"),
+        # 逗号分隔的 CPU 编号，例如 "0,1,2,3"
+        cpu_affinity=frozenset(int(cpu) for cpu in cpu_affinity.split(",")) if cpu_affinity else None,
+    )
+
+def event_loop_options() -> dict:
+    """返回 anyio.run 使用的事件循环参数，在可用时使用 uvloop
+    
+    通过 anyio 的 use_uvloop 选项只为本次运行创建 uvloop 循环，
+    不设置全局事件循环策略（该接口在 Python 3.12 起逐步弃用）。
+    
+    返回:
+        dict: 传给 anyio.run 的 backend_options（Windows 或未安装 uvloop 时为空，使用默认事件循环）
+    """
+    if importlib.util.find_spec("uvloop") is None:
+        return {}
+    return {"use_uvloop": True}
+
+def encode_sse_event(data, sep: str) -> bytes:
+    """将事件编码为 SSE 帧，替代 sse_starlette 的 ensure_bytes
+    
+    MCP 的 SSE 传输发送的事件都是 {"event": ..., "data": <单行 JSON>}，
+    这类事件直接拼接成字节串，跳过 ServerSentEvent 对整段数据的按行切分；
+    含换行符或其他形式的事件仍交给 ensure_bytes 处理，输出完全一致。
+    
+    参数:
+        data: 事件内容（bytes、dict 或 ServerSentEvent）
+        sep (str): 行分隔符
+        
+    返回:
+        bytes: 编码后的 SSE 帧
+    """
+    if type(data) is dict and data.keys() == {"event", "data"}:
+        event, payload = data["event"], data["data"]
+        if (isinstance(event, str) and isinstance(payload, str)
+                and "\n" not in payload and "\r" not in payload
+                and "\n" not in event and "\r" not in event):
+            return f"event: {event}{sep}data: {payload}{sep}{sep}".encode("utf-8")
+    return ensure_bytes(data, sep)
+
+def install_fast_sse_encoder() -> None:
+    """让 EventSourceResponse 使用 encode_sse_event 编码事件"""
+    sse_starlette.sse.ensure_bytes = encode_sse_event
+
+def bind_unix_socket(path: str, backlog: int = 2048) -> socket.socket:
+    """创建并监听 Unix 域套接字
+    
+    上次运行遗留的套接字文件会先被删除；文件权限设为 0o660，
+    只允许属主和同组用户（如反向代理）连接。
+    
+    参数:
+        path (str): 套接字文件路径
+        backlog (int): 监听队列长度
+        
+    返回:
+        socket.socket: 已处于监听状态的套接字
+    """
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+    except OSError:
+        sock.close()
+        raise
+    try:
+        os.chmod(path, 0o660)
+        sock.listen(backlog)
+    except OSError:
+        close_listener(sock, path)
+        raise
+    return sock
+
+def close_listener(sock: socket.socket, uds_path: str | None = None) -> None:
+    """关闭监听套接字，Unix 域套接字同时删除套接字文件
+    
+    参数:
+        sock (socket.socket): 监听套接字
+        uds_path (str, 可选): Unix 域套接字文件路径
+    """
+    sock.close()
+    if uds_path:
+        try:
+            os.unlink(uds_path)
+        except FileNotFoundError:
+            pass
+
+def bind_tcp_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """创建并监听 TCP 套接字
+    
+    启用 SO_REUSEADDR，重启时不会因旧连接处于 TIME_WAIT 而绑定失败。
+    不启用 SO_REUSEPORT：SSE 会话保存在进程内存中，同一端口上的第二个实例必须绑定失败，
+    否则内核会把 /sse 和 /messages/ 请求分给不同进程，导致会话随机失效。
+    
+    参数:
+        host (str): 监听地址，包含 ":" 时按 IPv6 地址处理
+        port (int): 监听端口
+        backlog (int): 监听队列长度
+        
+    返回:
+        socket.socket: 已处于监听状态的套接字
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind((host, port))
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def build_middleware() -> list[Middleware]:
+    """构建 SSE 应用使用的中间件列表
+    
+    GZip 只压缩普通响应，text/event-stream 会被 Starlette 自动跳过，
+    压缩事件流会导致事件无法及时推送到客户端。
+    
+    返回:
+        list[Middleware]: 中间件列表，按从外到内的顺序排列
+    """
+    return [
+        Middleware(SSEHeadersMiddleware),
+        Middleware(GZipMiddleware, minimum_size=500),
+    ]
+
+async def serve(app: ASGIApp, sock: socket.socket, uvicorn_config: dict,
+                threadpool_size: int | None = None) -> None:
+    """在当前事件循环中使用 uvicorn 运行 SSE 服务器
+    
+    参数:
+        app (ASGIApp): FastMCP 生成的 SSE 应用
+        sock (socket.socket): 已处于监听状态的套接字（TCP 或 Unix 域套接字）
+        uvicorn_config (dict): 传给 uvicorn.Config 的额外参数
+        threadpool_size (int, 可选): anyio 默认线程池大小，为 None 时保持默认值（40）
+    """
+    # 线程池限制器属于事件循环，只能在循环内设置
+    if threadpool_size is not None:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size
+    # 与 FastMCP 自带的 run_async 使用相同的默认参数
+    config = uvicorn.Config(app, timeout_graceful_shutdown=0, lifespan="on", **uvicorn_config)
+    await uvicorn.Server(config).serve(sockets=[sock])
+
+async def serve_http2(app: ASGIApp, sock: socket.socket, access_log: bool,
+                      certfile: str | None = None, keyfile: str | None = None,
+                      threadpool_size: int | None = None) -> None:
+    """使用 hypercorn 运行支持 HTTP/2 的 SSE 服务器
+    
+    HTTP/2 在一个连接上复用多个 SSE 流，不受浏览器 HTTP/1.1 每个源约 6 个连接的限制。
+    提供证书时启用 TLS 并通过 ALPN 协商 h2/http/1.1；否则为明文 h2c，
+    适合部署在终止 TLS 的反向代理之后。
+    
+    参数:
+        app (ASGIApp): FastMCP 生成的 SSE 应用
+        sock (socket.socket): 已处于监听状态的套接字（TCP 或 Unix 域套接字）
+        access_log (bool): 是否输出访问日志
+        certfile (str, 可选): TLS 证书文件路径
+        keyfile (str, 可选): TLS 私钥文件路径
+        threadpool_size (int, 可选): anyio 默认线程池大小，为 None 时保持默认值（40）
+        
+    异常:
+        RuntimeError: 未安装 hypercorn 时抛出
+    """
+    try:
+        from hypercorn.asyncio import serve as hypercorn_serve
+        from hypercorn.config import Config
+    except ImportError:
+        raise RuntimeError("SSE_HTTP2=1 需要安装 hypercorn: pip install 'hypercorn>=0.17'")
+    
+    if threadpool_size is not None:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size
+    
+    config = Config()
+    # hypercorn 退出时会关闭它接管的描述符，这里交给它一个副本
+    config.bind = [f"fd://{os.dup(sock.fileno())}"]
+    config.alpn_protocols = ["h2", "http/1.1"]
+    if access_log:
+        config.accesslog = "-"
+    if certfile:
+        config.certfile = certfile
+        config.keyfile = keyfile
+    
+    await hypercorn_serve(app, config)
+
+def setup_logging() -> None:
+    """为启动信息配置日志输出
+    
+    只输出消息文本（写到 stderr），不修改根日志记录器，也不影响 uvicorn 的日志配置。
+    """
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+def _raise_keyboard_interrupt(signum, frame) -> None:
+    """SIGTERM 处理函数：按 Ctrl+C 的方式退出，保证 finally 中的清理逻辑会执行"""
+    raise KeyboardInterrupt
 
 def main():
     """启动 SSE 服务器"""
-    # 获取端口配置，默认使用 3001
-    port = int(os.getenv("SSE_PORT", "3001"))
-    host = os.getenv("SSE_HOST", "localhost")
+    setup_logging()
     
-    print(f"启动 MySQL Explorer SSE 服务器...")
-    print(f"服务器地址: http://{host}:{port}")
-    print(f"SSE 端点: http://{host}:{port}/sse")
-    print("按 Ctrl+C 停止服务器")
-    print("-" * 50)
+    # 工具模块延迟导入，.env 需要在读取 SSE_* 配置之前加载
+    load_dotenv()
     
+    # 启动前校验配置，配置错误时直接退出
     try:
-        # 设置环境变量供 FastMCP 使用
-        os.environ["FASTMCP_HOST"] = host
-        os.environ["FASTMCP_PORT"] = str(port)
+        config = get_sse_config()
+    except ValueError as e:
+        logger.error(f"配置错误: {e}")
+        sys.exit(1)
+    if config.http2 and importlib.util.find_spec("hypercorn") is None:
+        logger.error("配置错误: SSE_HTTP2=1 需要安装 hypercorn: pip install 'hypercorn>=0.17'")
+        sys.exit(1)
+    logger.info(config.banner)
+    
+    # 配置校验通过后再导入 FastMCP 和工具模块，配置错误时可以尽快退出
+    import pymysql
+    from .mysql_explorer_sse import mcp, check_database
+    
+    # 启动前测试数据库连接
+    try:
+        logger.info(f"数据库连接测试成功: {check_database()}")
+    except (ValueError, pymysql.Error) as e:
+        logger.error(f"数据库连接失败: {e}")
+        logger.error("请检查数据库连接配置，并确保 MySQL 服务器正在运行")
+        sys.exit(1)
+    
+    app = mcp.http_app(transport="sse", middleware=build_middleware())
+    
+    # 默认关闭访问日志，避免每个请求都写一条日志
+    uvicorn_config = {"access_log": config.access_log, "log_level": mcp.settings.log_level.lower()}
+    if config.limit_concurrency:
+        uvicorn_config["limit_concurrency"] = config.limit_concurrency
+    sock = None
+    
+    # systemd、k8s 等使用 SIGTERM 停止服务。uvicorn 关闭后会把捕获的信号重新发给
+    # 原处理函数，默认处理会直接结束进程，Unix 域套接字文件就无法删除
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    
+    try:
+        # 空闲时按间隔发送 ": ping" 注释，防止反向代理断开长时间无数据的连接
+        EventSourceResponse.DEFAULT_PING_INTERVAL = config.heartbeat
+        install_fast_sse_encoder()
+        
+        # 优先使用 uvloop 事件循环
+        backend_options = event_loop_options()
+        loop_name = "uvloop" if backend_options.get("use_uvloop") else "asyncio"
+        logger.info(f"事件循环: {loop_name}")
+        
+        # 将进程绑定到指定 CPU，减少进程迁移造成的缓存失效（仅 Linux 支持）
+        if config.cpu_affinity:
+            if hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, config.cpu_affinity)
+                logger.info(f"CPU 亲和性: {','.join(map(str, sorted(config.cpu_affinity)))}")
+            else:
+                logger.warning("当前平台不支持 SSE_CPU_AFFINITY，已忽略")
+        
+        # 预先绑定监听套接字，再交给 uvicorn 或 hypercorn
+        if config.uds_path:
+            sock = bind_unix_socket(config.uds_path, config.backlog)
+        else:
+            sock = bind_tcp_socket(config.host, config.port, config.backlog)
+        
+        if config.http2:
+            logger.info(f"HTTP 协议: HTTP/2 ({'h2' if config.certfile else 'h2c'}), hypercorn")
+            anyio.run(serve_http2, app, sock, config.access_log,
+                      config.certfile, config.keyfile, config.threadpool_size,
+                      backend_options=backend_options)
+            return
+        
+        # uvicorn[standard] 附带 httptools（C 实现的 HTTP 解析器），未安装时回退到 h11
+        if importlib.util.find_spec("httptools") is not None:
+            uvicorn_config["http"] = "httptools"
+        logger.info(f"HTTP 解析器: {uvicorn_config.get('http', 'h11')}")
         
         # 运行 SSE 服务器
-        mcp.run(transport="sse")
+        anyio.run(serve, app, sock, uvicorn_config, config.threadpool_size,
+                  backend_options=backend_options)
     except KeyboardInterrupt:
-        print("\n服务器已停止")
-    except Exception as e:
-        print(f"启动服务器时发生错误: {e}")
-        sys.exit(1)
+        # uvicorn 和 hypercorn 都会在收到 SIGINT/SIGTERM 时先关闭连接再退出
+        logger.info("服务器已停止")
+    except OSError as e:
+        # 端口被占用、套接字权限不足等：不再展开调用栈，立即退出，便于进程管理器尽快重启
+        logger.error(f"启动服务器时发生错误: {e}")
+        # os._exit 不会执行 finally，先删除已创建的套接字文件
+        if sock:
+            close_listener(sock, config.uds_path)
+        os._exit(1)
+    finally:
+        if sock:
+            close_listener(sock, config.uds_path)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -6,7 +6,7 @@ MySQL Explorer SSE 启动脚本
 
 def main():
     """启动 MySQL Explorer SSE 服务器"""
-    from .mysql_explorer_sse import main as start_server
+    from .run_sse_server import main as start_server
     start_server()
 
 if __name__ == "__main__":
@@ -5,5 +5,5 @@ MySQL Explorer SSE 启动脚本
 """
 
 if __name__ == "__main__":
-    from mysql_explorer_sse.mysql_explorer_sse import main
+    from mysql_explorer_sse.run_sse_server import main
     main() 
\ No newline at end of file